@@ -3,14 +3,46 @@ Auto-selection logic for choosing the best background removal method.
 Uses rule-based analysis of image characteristics.
 """
 import cv2
+import threading
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 import sys
 import os
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, _BACKEND_DIR)
 from config import settings
 
 
+def _load_face_detector():
+    """Load the YuNet DNN face detector, or None if its model file is missing."""
+    path = settings.face_detector_model
+    if not os.path.isabs(path):
+        path = os.path.join(_BACKEND_DIR, path)
+    if not os.path.exists(path):
+        return None
+
+    return cv2.FaceDetectorYN.create(
+        path, "", (320, 320), 0.6, 0.3, 5000,
+        cv2.dnn.DNN_BACKEND_OPENCV, cv2.dnn.DNN_TARGET_CPU,
+    )
+
+
+# Load face detectors once per process rather than per AutoSelector;
+# the Haar cascade is only needed when YuNet is unavailable
+_FACE_DETECTOR = _load_face_detector()
+_FACE_CASCADE = None if _FACE_DETECTOR is not None else cv2.CascadeClassifier(
+    cv2.data.haarcascades + "haarcascade_frontalface_default.xml"
+)
+
+# YuNet's setInputSize mutates the shared detector, so detection is serialized
+_face_detector_lock = threading.Lock()
+
+# Shared pool for the independent analysis stages (OpenCV/NumPy release
+# the GIL, so these overlap on separate cores)
+_analysis_pool = ThreadPoolExecutor(max_workers=3, thread_name_prefix="analyzer")
+
+
 @dataclass
 class ImageAnalysis:
     """Results of image analysis."""
@@ -39,10 +71,9 @@ class AutoSelector:
 
     def __init__(self):
         """Initialize with OpenCV face detector."""
-        # Use Haar cascade for fast face detection
-        self.face_cascade = cv2.CascadeClassifier(
-            cv2.data.haarcascades + "haarcascade_frontalface_default.xml"
-        )
+        # Prefer the quantized YuNet DNN; fall back to the Haar cascade
+        self.face_detector = _FACE_DETECTOR
+        self.face_cascade = _FACE_CASCADE
 
     def analyze(self, image: np.ndarray) -> ImageAnalysis:
         """
@@ -54,13 +85,24 @@ class AutoSelector:
         Returns:
             ImageAnalysis with recommendations
         """
-        # Convert to grayscale for analysis
-        gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+        # Analyses only need coarse signals, so run them all on one
+        # downscaled copy; the full-res image is left for the engine
+        small = self._downscale(image)
+        gray = cv2.cvtColor(small, cv2.COLOR_RGB2GRAY)
+
+        # Area averaging blends colors and lowers the entropy, so the color
+        # histograms use a nearest-neighbour sample instead
+        sampled = self._downscale(image, interpolation=cv2.INTER_NEAREST)
+        hsv = cv2.cvtColor(sampled, cv2.COLOR_RGB2HSV)
 
-        # Run all analyses
-        has_face = self._detect_face(gray)
-        color_entropy = self._calculate_color_entropy(image)
-        edge_density = self._calculate_edge_density(gray)
+        # Run all analyses in parallel
+        fut_face = _analysis_pool.submit(self._detect_face, small, gray)
+        fut_entropy = _analysis_pool.submit(self._calculate_color_entropy, hsv)
+        fut_edge = _analysis_pool.submit(self._calculate_edge_density, gray)
+
+        has_face = fut_face.result()
+        color_entropy = fut_entropy.result()
+        edge_density = fut_edge.result()
 
         # Decision logic
         if has_face:
@@ -77,18 +119,38 @@ class AutoSelector:
             recommended_method=method,
         )
 
-    def _detect_face(self, gray: np.ndarray) -> bool:
+    def _downscale(
+        self, image: np.ndarray, max_dim: int = 512, interpolation: int = cv2.INTER_AREA
+    ) -> np.ndarray:
         """
-        Detect if image contains a face.
+        Shrink image so its longest side is at most max_dim pixels.
 
-        Uses OpenCV Haar cascade for fast detection.
+        Returns the input unchanged if it is already small enough.
         """
-        # Resize for faster detection
-        max_dim = 400
-        h, w = gray.shape
+        h, w = image.shape[:2]
         scale = min(max_dim / max(h, w), 1.0)
         if scale < 1.0:
-            gray = cv2.resize(gray, None, fx=scale, fy=scale)
+            image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=interpolation)
+        return image
+
+    def _detect_face(self, image: np.ndarray, gray: np.ndarray) -> bool:
+        """
+        Detect if image contains a face.
+
+        Uses the YuNet DNN detector when its model is available, otherwise
+        the OpenCV Haar cascade.
+
+        Args:
+            image: RGB image (H, W, 3)
+            gray: Grayscale version of image (used by the Haar cascade)
+        """
+        if self.face_detector is not None:
+            h, w = gray.shape
+            bgr = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
+            with _face_detector_lock:
+                self.face_detector.setInputSize((w, h))
+                _, faces = self.face_detector.detect(bgr)
+            return faces is not None and len(faces) > 0
 
         faces = self.face_cascade.detectMultiScale(
             gray,
@@ -99,26 +161,26 @@ class AutoSelector:
 
         return len(faces) > 0
 
-    def _calculate_color_entropy(self, image: np.ndarray) -> float:
+    def _calculate_color_entropy(self, hsv: np.ndarray) -> float:
         """
         Calculate color entropy of the image.
 
         Lower entropy = more uniform colors = likely simple background.
-        """
-        # Convert to HSV and focus on hue
-        hsv = cv2.cvtColor(image, cv2.COLOR_RGB2HSV)
 
-        # Calculate histogram for each channel
-        entropy_sum = 0.0
-        for i in range(3):
-            hist = cv2.calcHist([hsv], [i], None, [32], [0, 256])
-            hist = hist.flatten() / hist.sum()  # Normalize
+        Args:
+            hsv: HSV image (H, W, 3)
+        """
+        # 32-bin histogram per channel (calcHist counts uint8 data in place)
+        counts = np.stack(
+            [cv2.calcHist([hsv], [i], None, [32], [0, 256]).ravel() for i in range(3)]
+        ).astype(np.float64)
+        counts /= counts.sum(axis=1, keepdims=True)  # Normalize
 
-            # Calculate entropy
-            hist = hist[hist > 0]  # Remove zeros
-            entropy_sum += -np.sum(hist * np.log2(hist))
+        # Empty bins contribute 0 (log2(1) = 0)
+        counts_masked = np.where(counts > 0, counts, 1.0)
+        entropy = -(counts * np.log2(counts_masked)).sum(axis=1)
 
-        return entropy_sum / 3.0  # Average entropy
+        return entropy.mean()  # Average entropy
 
     def _calculate_edge_density(self, gray: np.ndarray) -> float:
         """
@@ -126,11 +188,14 @@ class AutoSelector:
 
         Higher density = more complex scene.
         """
+        # Edge density is a coarse statistic, so a small copy is enough
+        small = self._downscale(gray, max_dim=256)
+
         # Apply Canny edge detection
-        edges = cv2.Canny(gray, 100, 200)
+        edges = cv2.Canny(small, 100, 200)
 
         # Calculate ratio of edge pixels
-        edge_pixels = np.sum(edges > 0)
+        edge_pixels = cv2.countNonZero(edges)
         total_pixels = edges.size
 
         return edge_pixels / total_pixels
@@ -0,0 +1,50 @@
+"""
+Result caching for background removal.
+Lets repeated uploads of the same image skip the pipeline entirely.
+"""
+import hashlib
+from collections import OrderedDict
+from typing import Optional
+
+# Maximum total size of the cached PNGs
+_CACHE_MAX_BYTES = 256 * 1024 * 1024  # 256MB
+
+# In-memory LRU of raw results (image as PNG bytes) keyed by image hash and
+# method; the JSON and raw endpoints share entries
+_cache: OrderedDict[str, dict] = OrderedDict()
+_cache_bytes = 0
+
+
+def make_key(file_bytes: bytes, method: str) -> str:
+    """Build a cache key from the raw upload bytes and requested method."""
+    return hashlib.blake2b(file_bytes, digest_size=16).hexdigest() + ":" + method
+
+
+def get_cached(key: str) -> Optional[dict]:
+    """Get a cached result by key, marking it as recently used."""
+    result = _cache.get(key)
+    if result is not None:
+        _cache.move_to_end(key)
+    return result
+
+
+def set_cached(key: str, result: dict):
+    """
+    Store a raw result, evicting least recently used entries while the
+    cached PNGs exceed _CACHE_MAX_BYTES.
+    """
+    global _cache_bytes
+
+    previous = _cache.pop(key, None)
+    if previous is not None:
+        _cache_bytes -= len(previous["image"])
+
+    size = len(result["image"])
+    if size > _CACHE_MAX_BYTES:
+        return
+
+    _cache[key] = result
+    _cache_bytes += size
+    while _cache_bytes > _CACHE_MAX_BYTES:
+        _, evicted = _cache.popitem(last=False)
+        _cache_bytes -= len(evicted["image"])
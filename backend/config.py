@@ -11,6 +11,12 @@ class Settings(BaseSettings):
     host: str = "0.0.0.0"
     port: int = 8000
     debug: bool = True
+    max_workers: int | None = None  # Processing pool size (None = half the CPU count)
+    # ONNX Runtime intra-op threads per model session (None = CPUs split across workers)
+    onnx_threads: int | None = None
+
+    # Task storage (e.g. "redis://localhost:6379/0"); tasks are kept in memory if unset
+    redis_url: str | None = None
 
     # CORS
     cors_origins: list[str] = ["*"]
@@ -23,6 +29,17 @@ class Settings(BaseSettings):
     entropy_threshold: float = 4.5  # Below this = uniform background
     edge_density_threshold: float = 0.15  # Below this = simple image
 
+    # YuNet face detector (relative to backend/); Haar cascade is used if missing
+    face_detector_model: str = "models/face_detection_yunet_2023mar_int8.onnx"
+
+    # rembg models (u2netp is the lite matting model; set to "u2net" for higher quality)
+    matting_model: str = "u2netp"
+    segmentation_model: str = "isnet-general-use"
+
+    # Directory (relative to backend/) checked for "<model>.int8.onnx" weights
+    # made by quantize_models.py; fp32 weights are used when none is found
+    int8_models_dir: str = "models"
+
     model_config = {"env_prefix": "ALPHADROP_"}
 
 
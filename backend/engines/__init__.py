@@ -3,6 +3,7 @@ from .base import BaseEngine, EngineResult
 from .color_based import ColorBasedEngine
 from .ai_matting import AIMattingEngine
 from .ai_segmentation import AISegmentationEngine
+from .batch import process_batch
 
 # Engine registry for factory pattern
 ENGINE_REGISTRY: dict[str, type[BaseEngine]] = {
@@ -3,9 +3,11 @@ AI Segmentation engine using rembg.
 Best for general objects and product images.
 """
 import logging
+import cv2
 import numpy as np
-from PIL import Image
+from config import settings
 from .base import BaseEngine, EngineResult
+from .mask_inference import predict_mask, new_model_session
 
 logger = logging.getLogger(__name__)
 
@@ -17,14 +19,19 @@ def _get_session():
     """Lazily initialize rembg session for segmentation."""
     global _rembg_session
     if _rembg_session is None:
-        logger.info("Loading isnet-general-use model for segmentation (first run may download ~170MB)...")
-        from rembg import new_session
-        # Use isnet-general-use for better object segmentation
-        _rembg_session = new_session("isnet-general-use")
-        logger.info("isnet-general-use model loaded successfully")
+        model = settings.segmentation_model
+        logger.info(f"Loading {model} model for segmentation (first run may download the weights)...")
+        # Defaults to isnet-general-use for better object segmentation
+        _rembg_session = new_model_session(model)
+        logger.info(f"{model} model loaded successfully")
     return _rembg_session
 
 
+def warmup() -> None:
+    """Load the model and run one dummy inference so the first request is fast."""
+    predict_mask(_get_session(), np.zeros((64, 64, 3), dtype=np.uint8))
+
+
 class AISegmentationEngine(BaseEngine):
     """
     AI-based segmentation engine using rembg with IS-Net model.
@@ -37,6 +44,13 @@ class AISegmentationEngine(BaseEngine):
 
     name = "segmentation"
 
+    # The model runs at <= 1024px, so larger inputs only add resize and
+    # post-processing cost
+    max_input_side = 1024
+
+    # The alpha is binarized in process()
+    binary_alpha = True
+
     def process(self, image: np.ndarray) -> EngineResult:
         """
         Remove background using AI segmentation.
@@ -50,23 +64,17 @@ class AISegmentationEngine(BaseEngine):
         self.validate_input(image)
 
         try:
-            from rembg import remove
-
-            # Convert to PIL for rembg
-            pil_image = Image.fromarray(image)
-
-            # Process with rembg (no alpha matting for sharper edges)
+            # Run the model directly on the numpy image (no alpha matting
+            # for sharper edges)
             session = _get_session()
             logger.info(f"Running segmentation on image {image.shape[1]}x{image.shape[0]}...")
-            result = remove(
-                pil_image,
-                session=session,
-                alpha_matting=False,  # Binary mask for clean edges
-            )
+            mask = predict_mask(session, image)
             logger.info("Segmentation complete")
 
-            # Convert back to numpy
-            rgba = np.array(result)
+            # Use the mask as alpha channel
+            rgba = np.empty((image.shape[0], image.shape[1], 4), dtype=np.uint8)
+            rgba[:, :, :3] = image
+            rgba[:, :, 3] = mask
 
             # Binarize alpha for cleaner segmentation
             rgba = self._binarize_alpha(rgba)
@@ -80,19 +88,21 @@ class AISegmentationEngine(BaseEngine):
             # Log error and return with low confidence
             print(f"AI Segmentation error: {e}")
             # Fallback: return image with full opacity
-            rgba = np.zeros((image.shape[0], image.shape[1], 4), dtype=np.uint8)
+            rgba = np.empty((image.shape[0], image.shape[1], 4), dtype=np.uint8)
             rgba[:, :, :3] = image
             rgba[:, :, 3] = 255
-            return EngineResult(rgba_image=rgba, confidence=0.1, method=self.name)
+            return EngineResult(rgba_image=rgba, confidence=0.1, method=self.name, degraded=True)
 
     def _binarize_alpha(self, rgba: np.ndarray, threshold: int = 127) -> np.ndarray:
         """
         Convert alpha channel to binary (0 or 255).
         Produces cleaner edges for object segmentation.
+
+        Modifies rgba in place and returns it.
         """
-        result = rgba.copy()
-        result[:, :, 3] = np.where(rgba[:, :, 3] > threshold, 255, 0).astype(np.uint8)
-        return result
+        _, binary = cv2.threshold(rgba[:, :, 3], threshold, 255, cv2.THRESH_BINARY)
+        rgba[:, :, 3] = binary
+        return rgba
 
     def _calculate_confidence(self, rgba: np.ndarray) -> float:
         """
@@ -107,7 +117,7 @@ class AISegmentationEngine(BaseEngine):
         total_pixels = alpha.size
 
         # Foreground ratio
-        fg_pixels = np.sum(alpha > 127)
+        fg_pixels = np.count_nonzero(alpha > 127)
         fg_ratio = fg_pixels / total_pixels
 
         # Ideal foreground ratio is 5-90%
@@ -13,6 +13,7 @@ class EngineResult:
     rgba_image: np.ndarray  # Output image with transparency (H, W, 4)
     confidence: float  # Confidence score 0.0 - 1.0
     method: str  # Method name used
+    degraded: bool = False  # Fallback output after a failure (not cached)
 
     def __post_init__(self):
         """Validate result."""
@@ -31,6 +32,14 @@ class BaseEngine(ABC):
 
     name: str = "base"
 
+    # Longest side the engine needs; larger inputs are downscaled before
+    # process() and the alpha is upsampled afterwards (None = full resolution)
+    max_input_side: int | None = None
+
+    # Whether the engine's alpha is strictly 0 or 255, so an upsampled alpha
+    # is re-thresholded rather than left with interpolated edges
+    binary_alpha: bool = False
+
     @abstractmethod
     def process(self, image: np.ndarray) -> EngineResult:
         """
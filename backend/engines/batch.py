@@ -0,0 +1,84 @@
+"""
+Batch processing across multiple images.
+Parallelizes engine.process over a pool of workers.
+
+This is a library API for scripts and integrations; the HTTP endpoints
+process single images in the server's own worker pool. Pass that pool
+(app.state.executor) as executor to reuse its warmed-up workers.
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+import numpy as np
+from .base import EngineResult
+
+# Long-lived pools, created on first use so their workers (and the ONNX
+# sessions they load) are reused across calls
+_process_pool: ProcessPoolExecutor | None = None
+_thread_pool: ThreadPoolExecutor | None = None
+_pool_lock = threading.Lock()
+
+
+def _get_process_pool() -> ProcessPoolExecutor:
+    """Get the shared process pool, creating it on first use."""
+    global _process_pool
+    with _pool_lock:
+        if _process_pool is None:
+            # spawn avoids forking a parent that holds ONNX threads
+            _process_pool = ProcessPoolExecutor(
+                max_workers=os.cpu_count() or 1,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _process_pool
+
+
+def _get_thread_pool() -> ThreadPoolExecutor:
+    """Get the shared thread pool, creating it on first use."""
+    global _thread_pool
+    with _pool_lock:
+        if _thread_pool is None:
+            _thread_pool = ThreadPoolExecutor(max_workers=os.cpu_count() or 1, thread_name_prefix="batch")
+        return _thread_pool
+
+
+def _process_one(image: np.ndarray, method: str) -> EngineResult:
+    """
+    Process a single image in a worker.
+
+    Imports the registry inside the worker so each process builds its
+    own engine (and its own ONNX session for the AI engines).
+    """
+    from . import get_engine
+
+    return get_engine(method).process(image)
+
+
+def process_batch(
+    images: list[np.ndarray],
+    method: str,
+    executor: Executor | None = None,
+) -> list[EngineResult]:
+    """
+    Remove background from several images in parallel.
+
+    By default AI engines run in a shared process pool, since rembg
+    sessions are not thread-safe. The color engine is pure OpenCV, which
+    releases the GIL, so it uses a cheaper shared thread pool.
+
+    Args:
+        images: List of RGB images (H, W, 3)
+        method: Engine method name (color, matting, segmentation)
+        executor: Pool to run on instead of the shared ones (must be a
+            process pool for the AI engines)
+
+    Returns:
+        EngineResults in the same order as images
+    """
+    if not images:
+        return []
+
+    if executor is None:
+        executor = _get_thread_pool() if method == "color" else _get_process_pool()
+
+    return list(executor.map(_process_one, images, [method] * len(images)))
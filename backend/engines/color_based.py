@@ -28,6 +28,7 @@ class ColorBasedEngine(BaseEngine):
         erode_iterations: int = 1,
         guided_radius: int = 4,
         guided_eps: float = 0.02,
+        guided_subsample: int = 4,
     ):
         """
         Initialize color-based engine.
@@ -37,11 +38,14 @@ class ColorBasedEngine(BaseEngine):
             erode_iterations: Number of erosion passes to remove border artifacts
             guided_radius: Radius for guided filter smoothing
             guided_eps: Regularization for guided filter (higher = smoother)
+            guided_subsample: Downsampling factor for the guided filter's
+                coefficient solve (1 = full resolution)
         """
         self.color_tolerance = color_tolerance
         self.erode_iterations = erode_iterations
         self.guided_radius = guided_radius
         self.guided_eps = guided_eps
+        self.guided_subsample = guided_subsample
 
     def process(self, image: np.ndarray) -> EngineResult:
         """
@@ -84,48 +88,55 @@ class ColorBasedEngine(BaseEngine):
         h, w = hsv.shape[:2]
         border_size = max(5, min(h, w) // 20)  # 5% of smaller dimension
 
-        # Collect border pixels
-        top = hsv[:border_size, :].reshape(-1, 3)
-        bottom = hsv[-border_size:, :].reshape(-1, 3)
-        left = hsv[:, :border_size].reshape(-1, 3)
-        right = hsv[:, -border_size:].reshape(-1, 3)
-
-        border_pixels = np.vstack([top, bottom, left, right])
+        # Border regions (corners are sampled twice, as before)
+        borders = (
+            hsv[:border_size, :],
+            hsv[-border_size:, :],
+            hsv[:, :border_size],
+            hsv[:, -border_size:],
+        )
 
         # Find dominant color using histogram
-        # Quantize to reduce noise
-        quantized = (border_pixels // 10) * 10
-        unique, counts = np.unique(quantized, axis=0, return_counts=True)
+        # Quantize to reduce noise (each channel -> 0..25) and pack each
+        # pixel into one key (preserving lexicographic order) so the mode is
+        # a linear bincount instead of a sort
+        levels = 26
+
+        def pack_keys(region: np.ndarray) -> np.ndarray:
+            q = (region // 10).reshape(-1, 3).astype(np.uint16)
+            return (q[:, 0] * levels + q[:, 1]) * levels + q[:, 2]
+
+        # Accumulate per-border histograms rather than stacking the pixels
+        counts = np.zeros(levels ** 3, dtype=np.intp)
+        for region in borders:
+            counts += np.bincount(pack_keys(region), minlength=levels ** 3)
 
         # Return most common color
-        dominant_idx = np.argmax(counts)
-        return unique[dominant_idx]
+        dominant_key = int(np.argmax(counts))
+        dominant = np.array([
+            dominant_key // (levels * levels),
+            (dominant_key // levels) % levels,
+            dominant_key % levels,
+        ])
+        return (dominant * 10).astype(np.uint8)
 
     def _create_color_mask(self, hsv: np.ndarray, bg_color: np.ndarray) -> np.ndarray:
         """
         Create binary mask where background pixels are 0.
         """
-        # Define tolerance ranges
-        h_tol = self.color_tolerance
-        s_tol = self.color_tolerance * 2
-        v_tol = self.color_tolerance * 2
+        # Define tolerance ranges (H, S, V) and clamp to the HSV value range
+        tols = np.array([1, 2, 2], dtype=np.int32) * self.color_tolerance
+        caps = np.array([179, 255, 255], dtype=np.int32)
+        center = bg_color.astype(np.int32)
 
-        lower = np.array([
-            max(0, int(bg_color[0]) - h_tol),
-            max(0, int(bg_color[1]) - s_tol),
-            max(0, int(bg_color[2]) - v_tol)
-        ])
-        upper = np.array([
-            min(179, int(bg_color[0]) + h_tol),
-            min(255, int(bg_color[1]) + s_tol),
-            min(255, int(bg_color[2]) + v_tol)
-        ])
+        lower = np.clip(center - tols, 0, caps).astype(np.uint8)
+        upper = np.clip(center + tols, 0, caps).astype(np.uint8)
 
-        # Create mask (background = 0, foreground = 255)
-        bg_mask = cv2.inRange(hsv, lower, upper)
-        fg_mask = cv2.bitwise_not(bg_mask)
+        # Create mask (background = 0, foreground = 255), inverting in place
+        mask = cv2.inRange(hsv, lower, upper)
+        cv2.bitwise_not(mask, dst=mask)
 
-        return fg_mask
+        return mask
 
     def _cleanup_mask(self, mask: np.ndarray, guide_image: np.ndarray) -> np.ndarray:
         """
@@ -169,15 +180,27 @@ class ColorBasedEngine(BaseEngine):
         radius = self.guided_radius
         eps = self.guided_eps
 
-        # Convert to float32 for precision
-        guide_float = guide.astype(np.float32) / 255.0
-        src_float = src.astype(np.float32) / 255.0
-
-        # Convert guide to grayscale if color
-        if len(guide_float.shape) == 3:
-            guide_gray = cv2.cvtColor(guide_float, cv2.COLOR_RGB2GRAY)
+        # Convert guide to grayscale before widening, so only one channel
+        # is ever converted to float32
+        if len(guide.shape) == 3:
+            guide = cv2.cvtColor(guide, cv2.COLOR_RGB2GRAY)
+        guide_gray = guide.astype(np.float32)
+        guide_gray *= 1.0 / 255.0
+        src_float = src.astype(np.float32)
+        src_float *= 1.0 / 255.0
+
+        # Fast guided filter: solve for the linear coefficients at reduced
+        # resolution, then apply them to the full-resolution guide
+        h, w = guide_gray.shape
+        subsample = self.guided_subsample
+        if subsample > 1:
+            small_size = (max(1, w // subsample), max(1, h // subsample))
+            guide_small = cv2.resize(guide_gray, small_size, interpolation=cv2.INTER_AREA)
+            src_small = cv2.resize(src_float, small_size, interpolation=cv2.INTER_AREA)
+            radius = max(1, radius // subsample)
         else:
-            guide_gray = guide_float
+            guide_small = guide_gray
+            src_small = src_float
 
         # Box filter helper (mean filter)
         ksize = 2 * radius + 1
@@ -186,28 +209,38 @@ class ColorBasedEngine(BaseEngine):
             return cv2.blur(img, (ksize, ksize))
 
         # Compute local statistics
-        mean_guide = box_filter(guide_gray)
-        mean_src = box_filter(src_float)
-        mean_guide_src = box_filter(guide_gray * src_float)
-        mean_guide_guide = box_filter(guide_gray * guide_gray)
-
-        # Compute covariance and variance
-        cov_guide_src = mean_guide_src - mean_guide * mean_src
-        var_guide = mean_guide_guide - mean_guide * mean_guide
-
-        # Compute linear coefficients
-        a = cov_guide_src / (var_guide + eps)
-        b = mean_src - a * mean_guide
+        mean_guide = box_filter(guide_small)
+        mean_src = box_filter(src_small)
+
+        # Compute covariance and variance in place on the blurred products
+        # to avoid a fresh full-size temporary per arithmetic step
+        cov_guide_src = box_filter(cv2.multiply(guide_small, src_small))
+        cov_guide_src -= cv2.multiply(mean_guide, mean_src)
+        var_guide = box_filter(cv2.multiply(guide_small, guide_small))
+        var_guide -= cv2.multiply(mean_guide, mean_guide)
+
+        # Compute linear coefficients (b reuses the mean_src buffer)
+        var_guide += eps
+        a = cv2.divide(cov_guide_src, var_guide)
+        b = mean_src
+        b -= cv2.multiply(a, mean_guide)
 
         # Compute means of coefficients
         mean_a = box_filter(a)
         mean_b = box_filter(b)
+        if subsample > 1:
+            mean_a = cv2.resize(mean_a, (w, h), interpolation=cv2.INTER_LINEAR)
+            mean_b = cv2.resize(mean_b, (w, h), interpolation=cv2.INTER_LINEAR)
 
-        # Compute output
-        output = mean_a * guide_gray + mean_b
+        # Compute output at full resolution, accumulating in place
+        output = mean_a
+        output *= guide_gray
+        output += mean_b
 
         # Convert back to uint8
-        return (output * 255).clip(0, 255).astype(np.uint8)
+        np.clip(output, 0.0, 1.0, out=output)
+        output *= 255
+        return output.astype(np.uint8)
 
     def _calculate_confidence(self, mask: np.ndarray) -> float:
         """
@@ -218,7 +251,7 @@ class ColorBasedEngine(BaseEngine):
         - Edges are clean (not too noisy)
         """
         total_pixels = mask.size
-        foreground_pixels = np.sum(mask > 127)
+        foreground_pixels = np.count_nonzero(mask > 127)
 
         # Foreground ratio (ideal: 10-90%)
         fg_ratio = foreground_pixels / total_pixels
@@ -230,8 +263,11 @@ class ColorBasedEngine(BaseEngine):
             ratio_score = 0.7
 
         # Edge smoothness (fewer edge pixels = cleaner)
-        edges = cv2.Canny(mask, 100, 200)
-        edge_ratio = np.sum(edges > 0) / total_pixels
+        # Count foreground/background transitions between 4-neighbours;
+        # on a near-binary mask this matches Canny without its gradient/NMS passes
+        fg = mask > 127
+        edge_pixels = np.count_nonzero(fg[1:, :] ^ fg[:-1, :]) + np.count_nonzero(fg[:, 1:] ^ fg[:, :-1])
+        edge_ratio = edge_pixels / total_pixels
         edge_score = max(0.3, 1.0 - edge_ratio * 10)
 
         # Combined confidence
@@ -242,7 +278,7 @@ class ColorBasedEngine(BaseEngine):
         """
         Apply mask as alpha channel to create RGBA image.
         """
-        rgba = np.zeros((image.shape[0], image.shape[1], 4), dtype=np.uint8)
+        rgba = np.empty((image.shape[0], image.shape[1], 4), dtype=np.uint8)
         rgba[:, :, :3] = image
         rgba[:, :, 3] = mask
         return rgba
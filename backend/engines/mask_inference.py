@@ -0,0 +1,163 @@
+"""
+Direct ONNX inference for rembg sessions.
+Runs the model behind a rembg session on numpy arrays, skipping rembg's
+PIL round trips and reusing I/O bindings between calls.
+"""
+import logging
+import os
+import threading
+import cv2
+import numpy as np
+from PIL import Image
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+_BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Preprocessing used by rembg for each model: (mean, std, input size)
+_U2NET_SPEC = ((0.485, 0.456, 0.406), (0.229, 0.224, 0.225), (320, 320))
+_MODEL_SPECS = {
+    "u2net": _U2NET_SPEC,
+    "u2netp": _U2NET_SPEC,
+    "u2net_human_seg": _U2NET_SPEC,
+    "silueta": _U2NET_SPEC,
+    "isnet-general-use": ((0.5, 0.5, 0.5), (1.0, 1.0, 1.0), (1024, 1024)),
+    "isnet-anime": ((0.485, 0.456, 0.406), (1.0, 1.0, 1.0), (1024, 1024)),
+}
+
+# I/O bindings and their output buffers, kept per thread and per session
+_local = threading.local()
+
+
+def _resize(image: np.ndarray, size: tuple[int, int]) -> np.ndarray:
+    """Resize with area averaging when shrinking and Lanczos when enlarging."""
+    h, w = image.shape[:2]
+    shrinking = size[0] * size[1] < w * h
+    interpolation = cv2.INTER_AREA if shrinking else cv2.INTER_LANCZOS4
+    return cv2.resize(image, size, interpolation=interpolation)
+
+
+def int8_model_path(model_name: str) -> str:
+    """Path where an int8-quantized copy of a model's weights is looked for."""
+    models_dir = settings.int8_models_dir
+    if not os.path.isabs(models_dir):
+        models_dir = os.path.join(_BACKEND_DIR, models_dir)
+    return os.path.join(models_dir, f"{model_name}.int8.onnx")
+
+
+def new_model_session(model_name: str):
+    """
+    Create a CPU rembg session, preferring int8-quantized weights.
+
+    Uses int8_model_path(model_name) when it exists (see quantize_models.py),
+    otherwise rembg's own fp32 weights.
+    """
+    import onnxruntime as ort
+    from rembg.sessions import sessions_class
+
+    sess_opts = ort.SessionOptions()
+    sess_opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    if settings.onnx_threads:
+        sess_opts.intra_op_num_threads = settings.onnx_threads
+
+    # Construct the session class directly: rembg's new_session() takes
+    # sess_opts positionally, and its signature differs between releases
+    session_class = next((sc for sc in sessions_class if sc.name() == model_name), None)
+    if session_class is None:
+        raise ValueError(f"No session class found for model '{model_name}'")
+
+    path = int8_model_path(model_name)
+    if not os.path.exists(path):
+        return session_class(model_name, sess_opts, providers=["CPUExecutionProvider"])
+
+    logger.info(f"Using int8 weights for {model_name} from {path}")
+
+    # Same session class (and preprocessing), loading the local int8 file
+    # instead of downloading the fp32 weights
+    int8_class = type(
+        f"Int8{session_class.__name__}",
+        (session_class,),
+        {"download_models": classmethod(lambda cls, *args, **kwargs: path)},
+    )
+    return int8_class(model_name, sess_opts, providers=["CPUExecutionProvider"])
+
+
+def preprocess(image: np.ndarray, model_name: str) -> np.ndarray:
+    """
+    Build a model's NCHW float32 input tensor the way rembg does.
+
+    Args:
+        image: RGB image (H, W, 3)
+        model_name: A model listed in _MODEL_SPECS
+
+    Returns:
+        Input tensor (1, 3, size, size)
+    """
+    mean, std, size = _MODEL_SPECS[model_name]
+
+    # Resize and normalize straight into an NCHW float32 tensor
+    x = _resize(image, size).astype(np.float32)
+    x *= 1.0 / max(float(x.max()), 1e-6)
+    x -= np.array(mean, dtype=np.float32)
+    x /= np.array(std, dtype=np.float32)
+    return np.ascontiguousarray(x.transpose(2, 0, 1)[np.newaxis])
+
+
+def _get_binding(inner_session, size: tuple[int, int]):
+    """Get (or create) this thread's I/O binding and preallocated output buffer."""
+    bindings = getattr(_local, "bindings", None)
+    if bindings is None:
+        bindings = _local.bindings = {}
+
+    key = id(inner_session)
+    if key not in bindings:
+        output = np.empty((1, 1, size[1], size[0]), dtype=np.float32)
+        binding = inner_session.io_binding()
+        binding.bind_output(
+            inner_session.get_outputs()[0].name,
+            "cpu",
+            0,
+            np.float32,
+            list(output.shape),
+            output.ctypes.data,
+        )
+        bindings[key] = (binding, output)
+
+    return bindings[key]
+
+
+def predict_mask(session, image: np.ndarray) -> np.ndarray:
+    """
+    Predict a foreground mask for an image with a rembg session.
+
+    Mirrors rembg's own preprocessing for known models. Unknown models
+    fall back to the session's predict().
+
+    Args:
+        session: rembg session from new_session()
+        image: RGB image (H, W, 3)
+
+    Returns:
+        Foreground mask (H, W) with values 0-255
+    """
+    spec = _MODEL_SPECS.get(session.model_name)
+    if spec is None:
+        return np.asarray(session.predict(Image.fromarray(image))[0])
+
+    size = spec[2]
+    h, w = image.shape[:2]
+    x = preprocess(image, session.model_name)
+
+    inner = session.inner_session
+    binding, output = _get_binding(inner, size)
+    binding.bind_cpu_input(inner.get_inputs()[0].name, x)
+    inner.run_with_iobinding(binding)
+
+    # Min-max normalize the prediction and scale back to the input size
+    pred = output[0, 0]
+    mi, ma = pred.min(), pred.max()
+    pred = (pred - mi) / max(float(ma - mi), 1e-6)
+    mask = (pred.clip(0, 1) * 255).astype(np.uint8)
+
+    return _resize(mask, (w, h))
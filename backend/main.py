@@ -3,16 +3,25 @@ AlphaDrop Backend - FastAPI server for background removal.
 """
 import logging
 import asyncio
-from fastapi import FastAPI, File, Form, UploadFile, HTTPException, BackgroundTasks
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, File, Form, UploadFile, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from pydantic import BaseModel
 from typing import Literal, Optional
 
+# SIMD-accelerated base64 when available
+try:
+    import pybase64 as base64
+except ImportError:
+    import base64
+
 from config import settings
-from utils import load_image, encode_png_base64
-from engines import get_engine, ENGINE_REGISTRY
-from analyzer import select_method
+from pipeline import run_pipeline, PipelineError, QueueProgress
+from cache import make_key, get_cached, set_cached
 from progress import (
     create_task,
     update_task,
@@ -30,11 +39,81 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Available engines, kept static so /health does not import the engines package
+ENGINE_NAMES = ("color", "matting", "segmentation")
+
+
+async def _cleanup_loop(interval_seconds: int = 60):
+    """Prune expired tasks periodically, off the request path."""
+    while True:
+        await asyncio.sleep(interval_seconds)
+        cleanup_old_tasks()
+
+
+def _init_worker(onnx_threads: int):
+    """Load and warm up the models once in each worker process."""
+    # Workers share the CPUs, so each session gets only its share of threads
+    settings.onnx_threads = onnx_threads
+
+    from engines import ai_matting, ai_segmentation
+    import analyzer  # noqa: F401  (loads the face detector)
+
+    for name, warmup in (("matting", ai_matting.warmup), ("segmentation", ai_segmentation.warmup)):
+        try:
+            warmup()
+            logger.info(f"Warmed up {name} engine in worker {os.getpid()}")
+        except Exception as e:
+            logger.warning(f"Failed to warm up {name} engine: {e}")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start the warmed-up worker pool, the task queue workers and task cleanup."""
+    # CPU-bound processing runs in worker processes so it never blocks the
+    # event loop; spawn avoids forking a parent that holds ONNX threads
+    cpu_count = os.cpu_count() or 1
+    max_workers = settings.max_workers or max(1, cpu_count // 2)
+    onnx_threads = settings.onnx_threads or max(1, cpu_count // max_workers)
+    mp_context = multiprocessing.get_context("spawn")
+    app.state.executor = ProcessPoolExecutor(
+        max_workers=max_workers,
+        mp_context=mp_context,
+        initializer=_init_worker,
+        initargs=(onnx_threads,),
+    )
+
+    # Queues from this manager carry task progress back from the workers
+    app.state.progress_manager = mp_context.Manager()
+
+    # Workers start on demand, so submit one no-op per worker to spawn them
+    # all now; a worker only takes jobs once its models are warm
+    loop = asyncio.get_running_loop()
+    await asyncio.gather(
+        *(loop.run_in_executor(app.state.executor, os.getpid) for _ in range(max_workers))
+    )
+    logger.info(f"Started {max_workers} processing workers with {onnx_threads} ONNX threads each")
+
+    # Queued tasks are drained by one job worker per pool process
+    app.state.job_queue = asyncio.Queue()
+    job_workers = [asyncio.create_task(_job_worker(app.state.job_queue)) for _ in range(max_workers)]
+
+    cleanup_task = asyncio.create_task(_cleanup_loop())
+
+    yield
+
+    cleanup_task.cancel()
+    for worker in job_workers:
+        worker.cancel()
+    app.state.executor.shutdown(cancel_futures=True)
+    app.state.progress_manager.shutdown()
+
+
 # Create FastAPI app
 app = FastAPI(
     title="AlphaDrop API",
     description="Background removal API with multiple engines",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # Configure CORS
@@ -44,6 +123,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Method", "X-Confidence"],  # read by clients of the raw endpoint
 )
 
 
@@ -83,8 +163,64 @@ class TaskProgressResponse(BaseModel):
     error: Optional[str] = None
 
 
-# Store for processing tasks data (image bytes + method)
-_task_data: dict[str, dict] = {}
+def _sniff_format(head: bytes) -> str | None:
+    """
+    Identify an image format from its first 16 bytes.
+
+    Returns:
+        MIME type (as listed in supported_formats), or None if unrecognized
+    """
+    if head[:3] == b"\xff\xd8\xff":
+        return "image/jpeg"
+    if head[:8] == b"\x89PNG\r\n\x1a\n":
+        return "image/png"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    if head[4:8] == b"ftyp" and head[8:12] in (b"avif", b"avis", b"mif1", b"msf1"):
+        return "image/avif"
+    return None
+
+
+async def _iter_chunks(upload: UploadFile, chunk_size: int = 64 * 1024):
+    """Yield an upload's contents in fixed-size chunks."""
+    while chunk := await upload.read(chunk_size):
+        yield chunk
+
+
+async def _read_upload(upload: UploadFile) -> bytes:
+    """
+    Read an upload into memory, stopping as soon as it exceeds max_image_size.
+
+    The format is checked from the first 16 bytes before the rest is read,
+    so non-image payloads are rejected without reading them in full.
+
+    Raises:
+        HTTPException: 415 if the data is not a supported image format,
+            413 if the upload is too large, 400 if it cannot be read
+    """
+    try:
+        head = await upload.read(16)
+        if _sniff_format(head) not in settings.supported_formats:
+            raise HTTPException(
+                status_code=415,
+                detail=f"Unsupported image format. Supported: {settings.supported_formats}",
+            )
+
+        buf = bytearray(head)
+        async for chunk in _iter_chunks(upload):
+            buf.extend(chunk)
+            if len(buf) > settings.max_image_size:
+                raise HTTPException(
+                    status_code=413,
+                    detail=f"Image too large. Maximum size: {settings.max_image_size // (1024*1024)}MB",
+                )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Failed to read image: {e}")
+        raise HTTPException(status_code=400, detail="Failed to read image file")
+
+    return bytes(buf)
 
 
 @app.get("/health", response_model=HealthResponse)
@@ -93,75 +229,99 @@ async def health_check():
     return HealthResponse(
         status="healthy",
         version="1.0.0",
-        engines=list(ENGINE_REGISTRY.keys()),
+        engines=list(ENGINE_NAMES),
     )
 
 
-def process_task_sync(task_id: str, file_bytes: bytes, method: str, filename: str):
-    """Synchronous task processing function (runs in background)."""
-    progress = ProgressCallback(task_id)
+def _encode_result(result: dict) -> dict:
+    """Turn a raw pipeline result (PNG bytes) into a JSON one (base64 PNG)."""
+    return {**result, "image": base64.b64encode(result["image"]).decode("ascii")}
+
+
+async def _relay_progress(updates, progress: ProgressCallback):
+    """Record progress updates sent by a worker until a None sentinel arrives."""
+    while (update := await asyncio.to_thread(updates.get)) is not None:
+        await progress.report(TaskStatus.PROCESSING, *update)
 
-    try:
-        # Load image
-        progress.report(TaskStatus.PROCESSING, 5, "Loading image...")
-        rgb_image = load_image(file_bytes)
-        logger.info(f"Task {task_id}: Processing image shape: {rgb_image.shape}, method: {method}")
 
-        analysis_result = None
+async def _get_result(
+    file_bytes: bytes,
+    method: str,
+    progress: Optional[ProgressCallback] = None,
+) -> dict:
+    """
+    Get the raw result (PNG bytes) for an upload, from the cache or by
+    running the pipeline in the worker pool.
+
+    Args:
+        file_bytes: Raw image file bytes
+        method: Requested method
+        progress: Task to report the pipeline's stages to, if any
+
+    Raises:
+        HTTPException: If the pipeline fails
+    """
+    cache_key = make_key(file_bytes, method)
+    result = get_cached(cache_key)
+    if result is not None:
+        logger.info(f"Cache hit for method: {method}")
+        return result
 
-        # Handle auto-selection
-        if method == "auto":
-            progress.report(TaskStatus.PROCESSING, 10, "Analyzing image...")
+    loop = asyncio.get_running_loop()
+    try:
+        if progress is None:
+            result = await loop.run_in_executor(app.state.executor, run_pipeline, file_bytes, method, True)
+        else:
+            # The worker reports its stages through a manager queue
+            updates = await asyncio.to_thread(app.state.progress_manager.Queue)
+            relay = asyncio.create_task(_relay_progress(updates, progress))
             try:
-                from analyzer import select_method
-                analysis = select_method(rgb_image)
-                method = analysis.recommended_method
-                analysis_result = {
-                    "has_face": analysis.has_face,
-                    "color_entropy": round(analysis.color_entropy, 2),
-                    "edge_density": round(analysis.edge_density, 4),
-                    "auto_selected": method,
-                }
-                logger.info(f"Task {task_id}: Auto-selected method: {method}")
-            except Exception as e:
-                logger.warning(f"Task {task_id}: Auto-selection failed: {e}")
-                method = "segmentation"
-
-        # Load model (this is often the slow part)
-        if method in ["matting", "segmentation"]:
-            progress.loading_model(method)
-
-        # Get engine and process
-        progress.report(TaskStatus.PROCESSING, 40, f"Running {method}...")
-        engine = get_engine(method)
-        result = engine.process(rgb_image)
-
-        # Post-processing
-        progress.post_processing()
-
-        # Encode result
-        progress.encoding()
-        image_base64 = encode_png_base64(result.rgba_image)
-
-        logger.info(f"Task {task_id}: Completed with {result.method}, confidence: {result.confidence:.2f}")
-
-        # Complete with result
-        progress.complete({
-            "success": True,
-            "method_used": result.method,
-            "confidence": result.confidence,
-            "image": image_base64,
-            "analysis": analysis_result,
-        })
+                result = await loop.run_in_executor(
+                    app.state.executor, run_pipeline, file_bytes, method, True, QueueProgress(updates)
+                )
+            finally:
+                await asyncio.to_thread(updates.put, None)
+                await relay
+    except PipelineError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+    # Fallback output from a transient failure should not be served to retries
+    if not result["degraded"]:
+        set_cached(cache_key, result)
+    return result
+
+
+async def process_task(task_id: str, file_bytes: bytes, method: str, filename: str):
+    """Run a task in the worker pool and record its progress (runs in a job worker)."""
+    progress = ProgressCallback(task_id)
+
+    try:
+        await progress.report(TaskStatus.PROCESSING, 10, f"Processing {filename}...")
+        result = await _get_result(file_bytes, method, progress)
 
+        logger.info(f"Task {task_id}: Completed with {result['method_used']}, confidence: {result['confidence']:.2f}")
+        await progress.complete(_encode_result(result))
+
+    except HTTPException as e:
+        logger.error(f"Task {task_id} failed: {e.detail}")
+        await progress.fail(e.detail)
     except Exception as e:
         logger.error(f"Task {task_id} failed: {e}")
-        progress.fail(str(e))
+        await progress.fail(str(e))
+
+
+async def _job_worker(queue: asyncio.Queue):
+    """Take tasks off the queue and process them one at a time."""
+    while True:
+        job = await queue.get()
+        try:
+            await process_task(*job)
+        finally:
+            queue.task_done()
 
 
 @app.post("/v1/start-task", response_model=TaskStartResponse)
 async def start_task(
-    background_tasks: BackgroundTasks,
     image: UploadFile = File(..., description="Image file to process"),
     method: Literal["auto", "matting", "segmentation", "color"] = Form(
         default="auto", description="Background removal method"
@@ -170,39 +330,15 @@ async def start_task(
     """
     Start a background removal task and return task ID for progress tracking.
     """
-    # Validate content type
-    if image.content_type not in settings.supported_formats:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Unsupported image format: {image.content_type}",
-        )
-
-    # Read image bytes
-    try:
-        file_bytes = await image.read()
-    except Exception as e:
-        logger.error(f"Failed to read image: {e}")
-        raise HTTPException(status_code=400, detail="Failed to read image file")
-
-    # Check file size
-    if len(file_bytes) > settings.max_image_size:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Image too large. Maximum size: {settings.max_image_size // (1024*1024)}MB",
-        )
+    # Read image bytes (rejects non-images and oversized uploads early)
+    file_bytes = await _read_upload(image)
 
     # Create task
-    task_id = create_task()
+    task_id = await create_task()
     logger.info(f"Created task {task_id} for {image.filename}, method: {method}")
 
-    # Start processing in background
-    background_tasks.add_task(
-        process_task_sync,
-        task_id,
-        file_bytes,
-        method,
-        image.filename or "image.png",
-    )
+    # Queue for processing by the job workers
+    await app.state.job_queue.put((task_id, file_bytes, method, image.filename or "image.png"))
 
     return TaskStartResponse(task_id=task_id, status="started")
 
@@ -210,10 +346,7 @@ async def start_task(
 @app.get("/v1/task/{task_id}", response_model=TaskProgressResponse)
 async def get_task_progress(task_id: str):
     """Get progress of a background removal task."""
-    # Cleanup old tasks periodically
-    cleanup_old_tasks()
-
-    task = get_task(task_id)
+    task = await get_task(task_id)
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
 
@@ -248,95 +381,45 @@ async def remove_background(
     - segmentation: AI-based segmentation (best for objects)
     - color: Color-based heuristic (best for logos/icons with uniform backgrounds)
     """
-    # Validate content type
-    if image.content_type not in settings.supported_formats:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Unsupported image format: {image.content_type}. "
-            f"Supported: {settings.supported_formats}",
-        )
-
-    # Read image bytes
-    try:
-        file_bytes = await image.read()
-    except Exception as e:
-        logger.error(f"Failed to read image: {e}")
-        raise HTTPException(status_code=400, detail="Failed to read image file")
+    # Read image bytes (rejects non-images and oversized uploads early)
+    file_bytes = await _read_upload(image)
 
-    # Check file size
-    if len(file_bytes) > settings.max_image_size:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Image too large. Maximum size: {settings.max_image_size // (1024*1024)}MB",
-        )
+    logger.info(f"Processing image: {image.filename}, method: {method}")
 
-    # Load image
-    try:
-        rgb_image = load_image(file_bytes)
-    except Exception as e:
-        logger.error(f"Failed to decode image: {e}")
-        raise HTTPException(status_code=400, detail="Failed to decode image")
+    # Served from the result cache, or run in the worker pool
+    result = await _get_result(file_bytes, method)
 
-    logger.info(f"Processing image: {image.filename}, shape: {rgb_image.shape}, method: {method}")
+    return RemoveBackgroundResponse(**_encode_result(result))
 
-    analysis_result = None
 
-    # Handle auto-selection
-    if method == "auto":
-        try:
-            analysis = select_method(rgb_image)
-            method = analysis.recommended_method
-            analysis_result = {
-                "has_face": analysis.has_face,
-                "color_entropy": round(analysis.color_entropy, 2),
-                "edge_density": round(analysis.edge_density, 4),
-                "auto_selected": method,
-            }
-            logger.info(f"Auto-selected method: {method}, analysis: {analysis_result}")
-        except Exception as e:
-            logger.warning(f"Auto-selection failed: {e}, falling back to segmentation")
-            method = "segmentation"
+@app.post("/v1/remove-background-raw")
+async def remove_background_raw(
+    image: UploadFile = File(..., description="Image file to process"),
+    method: Literal["auto", "matting", "segmentation", "color"] = Form(
+        default="auto", description="Background removal method"
+    ),
+):
+    """
+    Remove background from an image and return the PNG directly.
 
-    # Get engine and process
-    try:
-        engine = get_engine(method)
-        result = engine.process(rgb_image)
-    except Exception as e:
-        logger.error(f"Engine {method} failed: {e}")
-
-        # Fallback chain: try segmentation, then color
-        fallback_methods = ["segmentation", "color"]
-        for fallback in fallback_methods:
-            if fallback != method:
-                try:
-                    logger.info(f"Trying fallback: {fallback}")
-                    engine = get_engine(fallback)
-                    result = engine.process(rgb_image)
-                    result.confidence *= 0.8  # Reduce confidence for fallback
-                    break
-                except Exception as fallback_error:
-                    logger.error(f"Fallback {fallback} also failed: {fallback_error}")
-        else:
-            raise HTTPException(
-                status_code=500,
-                detail="All background removal methods failed",
-            )
+    Skips the base64 JSON wrapper. The method used and confidence are
+    returned in the X-Method and X-Confidence headers.
+    """
+    # Read image bytes (rejects non-images and oversized uploads early)
+    file_bytes = await _read_upload(image)
 
-    # Encode result
-    try:
-        image_base64 = encode_png_base64(result.rgba_image)
-    except Exception as e:
-        logger.error(f"Failed to encode result: {e}")
-        raise HTTPException(status_code=500, detail="Failed to encode result image")
+    logger.info(f"Processing image (raw): {image.filename}, method: {method}")
 
-    logger.info(f"Successfully processed with {result.method}, confidence: {result.confidence:.2f}")
+    # Shares cache entries with /v1/remove-background
+    result = await _get_result(file_bytes, method)
 
-    return RemoveBackgroundResponse(
-        success=True,
-        method_used=result.method,
-        confidence=result.confidence,
-        image=image_base64,
-        analysis=analysis_result,
+    return Response(
+        content=result["image"],
+        media_type="image/png",
+        headers={
+            "X-Method": result["method_used"],
+            "X-Confidence": f"{result['confidence']:.3f}",
+        },
     )
 
 
@@ -0,0 +1,189 @@
+"""
+Background removal pipeline shared by all endpoints.
+Decodes, analyzes, processes and encodes a single image.
+"""
+import logging
+from typing import Callable, Optional
+import cv2
+import numpy as np
+
+from utils import load_image, encode_png_base64, rgba_to_png_bytes, apply_mask_to_image
+
+logger = logging.getLogger(__name__)
+
+
+class PipelineError(Exception):
+    """Processing failure carrying the HTTP status to report."""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(status_code, detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def _no_progress(progress: int, message: str):
+    """Default progress callback that ignores updates."""
+
+
+class QueueProgress:
+    """
+    Progress callback that forwards (percent, message) updates to a queue.
+
+    Picklable when the queue is (e.g. a multiprocessing.Manager queue), so
+    worker processes can report progress back to the server.
+    """
+
+    def __init__(self, queue):
+        self.queue = queue
+
+    def __call__(self, progress: int, message: str):
+        self.queue.put((progress, message))
+
+
+def _process_scaled(engine, image: np.ndarray):
+    """
+    Run an engine at no more than its max_input_side.
+
+    Larger images are downscaled before processing, and the resulting
+    alpha is upsampled and applied to the full-resolution image. Opaque
+    pixels keep the full-resolution colors; partially transparent ones take
+    the engine's upsampled colors, which keeps refined edge colors (e.g.
+    matting's foreground estimate) at the cost of some edge sharpness.
+    """
+    max_side = engine.max_input_side
+    h, w = image.shape[:2]
+    if max_side is None or max(h, w) <= max_side:
+        return engine.process(image)
+
+    scale = max_side / max(h, w)
+    small_size = (max(1, round(w * scale)), max(1, round(h * scale)))
+    small = cv2.resize(image, small_size, interpolation=cv2.INTER_AREA)
+    logger.info(f"Downscaled {w}x{h} to {small_size[0]}x{small_size[1]} for {engine.name}")
+
+    result = engine.process(small)
+    small_rgba = result.rgba_image
+    alpha = cv2.resize(small_rgba[:, :, 3], (w, h), interpolation=cv2.INTER_LINEAR)
+    if engine.binary_alpha:
+        _, alpha = cv2.threshold(alpha, 127, 255, cv2.THRESH_BINARY)
+    rgba = apply_mask_to_image(image, alpha)
+
+    edge = (alpha > 0) & (alpha < 255)
+    if edge.any():
+        rgb = cv2.resize(small_rgba[:, :, :3], (w, h), interpolation=cv2.INTER_LINEAR)
+        rgba[edge, :3] = rgb[edge]
+
+    result.rgba_image = rgba
+    return result
+
+
+def run_pipeline(
+    file_bytes: bytes,
+    method: str,
+    raw: bool = False,
+    on_progress: Optional[Callable[[int, str], None]] = None,
+) -> dict:
+    """
+    Decode, analyze, process and encode one image.
+
+    The server runs this in worker processes, so it only takes and
+    returns picklable values.
+
+    Args:
+        file_bytes: Raw image file bytes
+        method: Requested method (auto, matting, segmentation, color)
+        raw: Return the PNG as bytes instead of a base64 string
+        on_progress: Optional callback taking (percent, message), called in
+            the process running the pipeline (use QueueProgress to report
+            across processes)
+
+    Returns:
+        Dict matching RemoveBackgroundResponse (image holds PNG bytes if raw),
+        plus "degraded", set if a fallback replaced a failed stage
+
+    Raises:
+        PipelineError: If the image cannot be decoded, processed or encoded
+    """
+    # Imported here so the server process (and /health) never loads them
+    from engines import get_engine
+    from analyzer import select_method
+
+    report = on_progress or _no_progress
+
+    # Load image
+    report(20, "Decoding image...")
+    try:
+        rgb_image = load_image(file_bytes)
+    except Exception as e:
+        logger.error(f"Failed to decode image: {e}")
+        raise PipelineError(400, "Failed to decode image")
+
+    logger.info(f"Processing image shape: {rgb_image.shape}, method: {method}")
+
+    analysis_result = None
+
+    # Set when any stage falls back after a failure, so the result is not cached
+    degraded = False
+
+    # Handle auto-selection
+    if method == "auto":
+        report(30, "Analyzing image...")
+        try:
+            analysis = select_method(rgb_image)
+            method = analysis.recommended_method
+            analysis_result = {
+                "has_face": analysis.has_face,
+                "color_entropy": round(analysis.color_entropy, 2),
+                "edge_density": round(analysis.edge_density, 4),
+                "auto_selected": method,
+            }
+            logger.info(f"Auto-selected method: {method}, analysis: {analysis_result}")
+        except Exception as e:
+            logger.warning(f"Auto-selection failed: {e}, falling back to segmentation")
+            method = "segmentation"
+            degraded = True
+
+    # Get engine and process
+    report(50, "Processing image...")
+    try:
+        engine = get_engine(method)
+        result = _process_scaled(engine, rgb_image)
+    except Exception as e:
+        logger.error(f"Engine {method} failed: {e}")
+
+        # Fallback chain: try segmentation, then color
+        fallback_methods = ["segmentation", "color"]
+        for fallback in fallback_methods:
+            if fallback != method:
+                try:
+                    logger.info(f"Trying fallback: {fallback}")
+                    engine = get_engine(fallback)
+                    result = _process_scaled(engine, rgb_image)
+                    result.confidence *= 0.8  # Reduce confidence for fallback
+                    degraded = True
+                    break
+                except Exception as fallback_error:
+                    logger.error(f"Fallback {fallback} also failed: {fallback_error}")
+        else:
+            raise PipelineError(500, "All background removal methods failed")
+
+    # Encode result
+    report(90, "Encoding result...")
+    try:
+        if raw:
+            image = rgba_to_png_bytes(result.rgba_image)
+        else:
+            image = encode_png_base64(result.rgba_image)
+    except Exception as e:
+        logger.error(f"Failed to encode result: {e}")
+        raise PipelineError(500, "Failed to encode result image")
+
+    logger.info(f"Successfully processed with {result.method}, confidence: {result.confidence:.2f}")
+
+    return {
+        "success": True,
+        "method_used": result.method,
+        "confidence": result.confidence,
+        "image": image,
+        "analysis": analysis_result,
+        "degraded": degraded or result.degraded,
+    }
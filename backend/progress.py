@@ -2,11 +2,13 @@
 Progress tracking for background removal tasks.
 """
 import asyncio
+import json
 import uuid
 from dataclasses import dataclass, field
 from typing import Optional, Callable
 from enum import Enum
 import time
+from config import settings
 
 
 class TaskStatus(str, Enum):
@@ -31,23 +33,84 @@ class TaskProgress:
     created_at: float = field(default_factory=time.time)
 
 
-# In-memory task storage (for single-server deployment)
+# Tasks expire this long after creation
+TASK_TTL_SECONDS = 300
+
+# In-memory task storage (used when no Redis URL is configured)
 _tasks: dict[str, TaskProgress] = {}
 
+# Shared Redis client (lets several server workers see the same tasks)
+_redis = None
+
+# Sets hash fields only if the key exists, so an expired task is not
+# recreated; as one script the check and write are atomic, and HSET keeps
+# the key's TTL
+_UPDATE_IF_EXISTS_SCRIPT = """
+if redis.call("EXISTS", KEYS[1]) == 1 then
+    return redis.call("HSET", KEYS[1], unpack(ARGV))
+end
+return 0
+"""
+_update_if_exists = None
+
+
+def _get_redis():
+    """Lazily create the Redis client, or return None if Redis is not configured."""
+    global _redis, _update_if_exists
+    if _redis is None and settings.redis_url:
+        import redis.asyncio as redis
+        _redis = redis.from_url(settings.redis_url, decode_responses=True)
+        _update_if_exists = _redis.register_script(_UPDATE_IF_EXISTS_SCRIPT)
+    return _redis
+
+
+def _task_key(task_id: str) -> str:
+    """Redis key for a task's hash."""
+    return f"task:{task_id}"
+
+
+def _to_mapping(
+    status: TaskStatus,
+    progress: int,
+    message: str,
+    result: Optional[dict] = None,
+    error: Optional[str] = None,
+) -> dict:
+    """Flatten task fields into a Redis hash mapping (None fields are skipped)."""
+    mapping = {"status": status.value, "progress": progress, "message": message}
+    if result is not None:
+        mapping["result"] = json.dumps(result)
+    if error is not None:
+        mapping["error"] = error
+    return mapping
+
 
-def create_task() -> str:
+async def create_task() -> str:
     """Create a new task and return its ID."""
     task_id = str(uuid.uuid4())[:8]
-    _tasks[task_id] = TaskProgress(
+    task = TaskProgress(
         task_id=task_id,
         status=TaskStatus.PENDING,
         progress=0,
         message="Starting...",
     )
+
+    redis = _get_redis()
+    if redis is None:
+        _tasks[task_id] = task
+        return task_id
+
+    key = _task_key(task_id)
+    mapping = _to_mapping(task.status, task.progress, task.message)
+    mapping["created_at"] = task.created_at
+    async with redis.pipeline(transaction=True) as pipe:
+        pipe.hset(key, mapping=mapping)
+        pipe.expire(key, TASK_TTL_SECONDS)
+        await pipe.execute()
     return task_id
 
 
-def update_task(
+async def update_task(
     task_id: str,
     status: TaskStatus,
     progress: int,
@@ -56,23 +119,46 @@ def update_task(
     error: Optional[str] = None,
 ):
     """Update task progress."""
-    if task_id in _tasks:
-        _tasks[task_id].status = status
-        _tasks[task_id].progress = progress
-        _tasks[task_id].message = message
-        if result is not None:
-            _tasks[task_id].result = result
-        if error is not None:
-            _tasks[task_id].error = error
+    redis = _get_redis()
+    if redis is None:
+        if task_id in _tasks:
+            _tasks[task_id].status = status
+            _tasks[task_id].progress = progress
+            _tasks[task_id].message = message
+            if result is not None:
+                _tasks[task_id].result = result
+            if error is not None:
+                _tasks[task_id].error = error
+        return
+
+    mapping = _to_mapping(status, progress, message, result, error)
+    args = [item for pair in mapping.items() for item in pair]
+    await _update_if_exists(keys=[_task_key(task_id)], args=args)
+
+
+async def get_task(task_id: str) -> Optional[TaskProgress]:
+    """Get task progress by ID."""
+    redis = _get_redis()
+    if redis is None:
+        return _tasks.get(task_id)
 
+    data = await redis.hgetall(_task_key(task_id))
+    if not data:
+        return None
 
-def get_task(task_id: str) -> Optional[TaskProgress]:
-    """Get task progress by ID."""
-    return _tasks.get(task_id)
+    return TaskProgress(
+        task_id=task_id,
+        status=TaskStatus(data["status"]),
+        progress=int(data["progress"]),
+        message=data["message"],
+        result=json.loads(data["result"]) if "result" in data else None,
+        error=data.get("error"),
+        created_at=float(data["created_at"]) if "created_at" in data else time.time(),
+    )
 
 
-def cleanup_old_tasks(max_age_seconds: int = 300):
-    """Remove tasks older than max_age_seconds."""
+def cleanup_old_tasks(max_age_seconds: int = TASK_TTL_SECONDS):
+    """Remove tasks older than max_age_seconds (Redis expires its own keys)."""
     now = time.time()
     to_remove = [
         task_id
@@ -89,33 +175,13 @@ class ProgressCallback:
     def __init__(self, task_id: str):
         self.task_id = task_id
 
-    def report(self, status: TaskStatus, progress: int, message: str):
+    async def report(self, status: TaskStatus, progress: int, message: str):
         """Report progress update."""
-        update_task(self.task_id, status, progress, message)
-
-    def loading_model(self, model_name: str):
-        """Report model loading progress."""
-        self.report(TaskStatus.LOADING_MODEL, 10, f"Loading {model_name} model...")
-
-    def model_loaded(self):
-        """Report model loaded."""
-        self.report(TaskStatus.LOADING_MODEL, 30, "Model loaded")
-
-    def processing(self, progress: int = 50):
-        """Report processing progress."""
-        self.report(TaskStatus.PROCESSING, progress, "Processing image...")
-
-    def post_processing(self):
-        """Report post-processing."""
-        self.report(TaskStatus.POST_PROCESSING, 80, "Refining edges...")
-
-    def encoding(self):
-        """Report encoding."""
-        self.report(TaskStatus.ENCODING, 90, "Encoding result...")
+        await update_task(self.task_id, status, progress, message)
 
-    def complete(self, result: dict):
+    async def complete(self, result: dict):
         """Report completion with result."""
-        update_task(
+        await update_task(
             self.task_id,
             TaskStatus.COMPLETED,
             100,
@@ -123,9 +189,9 @@ class ProgressCallback:
             result=result,
         )
 
-    def fail(self, error: str):
+    async def fail(self, error: str):
         """Report failure."""
-        update_task(
+        await update_task(
             self.task_id,
             TaskStatus.FAILED,
             0,
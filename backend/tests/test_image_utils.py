@@ -0,0 +1,56 @@
+"""
+Tests for image loading.
+"""
+import struct
+import zlib
+
+import cv2
+import numpy as np
+import pytest
+from PIL import Image
+
+from utils.image_utils import load_image
+
+BOMB_SIDE = 14000  # 196M pixels, over Pillow's 2 * MAX_IMAGE_PIXELS limit
+
+
+def _png_chunk(kind: bytes, data: bytes) -> bytes:
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+
+def _bomb_png() -> bytes:
+    """Tiny PNG whose header claims BOMB_SIDE x BOMB_SIDE 8-bit RGB pixels."""
+    ihdr = struct.pack(">IIBBBBB", BOMB_SIDE, BOMB_SIDE, 8, 2, 0, 0, 0)
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + _png_chunk(b"IHDR", ihdr)
+        + _png_chunk(b"IDAT", zlib.compress(b"\x00" * 64))
+        + _png_chunk(b"IEND", b"")
+    )
+
+
+def _bomb_jpeg() -> bytes:
+    """Small JPEG with its frame header patched to BOMB_SIDE x BOMB_SIDE."""
+    data = bytearray(cv2.imencode(".jpg", np.zeros((8, 8, 3), dtype=np.uint8))[1].tobytes())
+    sof = data.index(b"\xff\xc0")
+    data[sof + 5:sof + 9] = struct.pack(">HH", BOMB_SIDE, BOMB_SIDE)
+    return bytes(data)
+
+
+@pytest.mark.parametrize("make_bomb", [_bomb_png, _bomb_jpeg])
+def test_decompression_bomb_is_rejected(make_bomb):
+    with pytest.raises(Image.DecompressionBombError):
+        load_image(make_bomb())
+
+
+@pytest.mark.parametrize("ext", [".png", ".jpg"])
+def test_load_image_returns_rgb(ext):
+    bgr = np.zeros((20, 30, 3), dtype=np.uint8)
+    bgr[:, :, 2] = 255  # red
+    data = cv2.imencode(ext, bgr)[1].tobytes()
+
+    rgb = load_image(data)
+
+    assert rgb.shape == (20, 30, 3)
+    assert rgb.dtype == np.uint8
+    assert rgb[10, 15, 0] > 250 and rgb[10, 15, 2] < 5
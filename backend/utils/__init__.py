@@ -1,2 +1,2 @@
 """Utility modules."""
-from .image_utils import load_image, encode_png_base64, rgba_to_png_bytes
+from .image_utils import load_image, encode_png_base64, rgba_to_png_bytes, apply_mask_to_image
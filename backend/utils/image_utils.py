@@ -1,11 +1,17 @@
 """
 Image loading and conversion utilities.
 """
-import base64
 import io
+import cv2
 from PIL import Image
 import numpy as np
 
+# SIMD-accelerated base64 when available
+try:
+    import pybase64 as base64
+except ImportError:
+    import base64
+
 # Enable AVIF support
 import pillow_avif  # noqa: F401
 
@@ -20,20 +26,130 @@ def load_image(file_bytes: bytes) -> np.ndarray:
     Returns:
         RGB image as numpy array (H, W, 3)
     """
+    rgb = _decode_fast(file_bytes)
+    if rgb is not None:
+        return rgb
+
     image = Image.open(io.BytesIO(file_bytes))
 
     # Convert to RGB if necessary
     if image.mode == "RGBA":
-        # Create white background for transparency
-        background = Image.new("RGB", image.size, (255, 255, 255))
-        background.paste(image, mask=image.split()[3])
-        image = background
+        # Composite onto a white background for transparency
+        return _flatten_alpha(np.asarray(image))
     elif image.mode != "RGB":
         image = image.convert("RGB")
 
     return np.array(image)
 
 
+def _decode_fast(file_bytes: bytes) -> np.ndarray | None:
+    """
+    Decode common JPEGs and PNGs with OpenCV's native decoders.
+
+    OpenCV bundles libjpeg-turbo, so JPEGs take its SIMD path. PNGs are
+    only handled for 8-bit RGB and RGBA, so palette, grayscale and
+    16-bit files keep Pillow's conversion behavior. EXIF orientation is
+    ignored to match Pillow.
+
+    Returns:
+        RGB image (H, W, 3), or None if the caller should fall back to Pillow
+    """
+    flags = cv2.IMREAD_COLOR | cv2.IMREAD_IGNORE_ORIENTATION
+    has_alpha = False
+
+    if file_bytes[:3] == b"\xff\xd8\xff":
+        size = _jpeg_size(file_bytes)
+    elif file_bytes[:8] == b"\x89PNG\r\n\x1a\n" and file_bytes[12:16] == b"IHDR":
+        size = (int.from_bytes(file_bytes[16:20], "big"), int.from_bytes(file_bytes[20:24], "big"))
+        bit_depth, color_type = file_bytes[24], file_bytes[25]
+        if bit_depth != 8 or color_type not in (2, 6):
+            return None
+        if color_type == 6:
+            flags = cv2.IMREAD_UNCHANGED
+            has_alpha = True
+    else:
+        return None
+
+    # Leave unknown or oversized dimensions to Pillow, which applies its
+    # decompression bomb limits (warning, then DecompressionBombError)
+    if size is None:
+        return None
+    if Image.MAX_IMAGE_PIXELS is not None and size[0] * size[1] > Image.MAX_IMAGE_PIXELS:
+        return None
+
+    decoded = cv2.imdecode(np.frombuffer(file_bytes, dtype=np.uint8), flags)
+    if decoded is None:
+        return None
+
+    if has_alpha:
+        return _flatten_alpha(cv2.cvtColor(decoded, cv2.COLOR_BGRA2RGBA))
+    return cv2.cvtColor(decoded, cv2.COLOR_BGR2RGB)
+
+
+def _jpeg_size(file_bytes: bytes) -> tuple[int, int] | None:
+    """
+    Read (width, height) from a JPEG's start-of-frame header.
+
+    Returns:
+        Image size, or None if no frame header is found
+    """
+    i, n = 2, len(file_bytes)
+    while i + 9 <= n:
+        if file_bytes[i] != 0xFF:
+            return None
+        marker = file_bytes[i + 1]
+        if marker == 0xFF:
+            # Fill byte before a marker
+            i += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD8:
+            # Standalone markers carry no length
+            i += 2
+            continue
+        # SOF0-SOF15, excluding DHT (C4), JPG (C8) and DAC (CC)
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            height = int.from_bytes(file_bytes[i + 5:i + 7], "big")
+            width = int.from_bytes(file_bytes[i + 7:i + 9], "big")
+            return width, height
+        i += 2 + int.from_bytes(file_bytes[i + 2:i + 4], "big")
+    return None
+
+
+def _flatten_alpha(rgba: np.ndarray) -> np.ndarray:
+    """
+    Composite an RGBA array onto a white background.
+
+    Args:
+        rgba: RGBA image (H, W, 4)
+
+    Returns:
+        RGB image (H, W, 3)
+    """
+    a = rgba[:, :, 3:4].astype(np.uint16)
+    rgb = rgba[:, :, :3] * a
+    rgb += (255 - a) * 255 + 127  # round to nearest, as Pillow does
+    rgb //= 255
+    return rgb.astype(np.uint8)
+
+
+def _encode_png_fast(rgba_image: np.ndarray) -> bytes:
+    """
+    Encode RGBA array to PNG with OpenCV's native encoder.
+
+    Uses zlib level 1, trading slightly larger files for much faster
+    encoding. Falls back to Pillow if OpenCV fails.
+    """
+    bgra = cv2.cvtColor(rgba_image, cv2.COLOR_RGBA2BGRA)
+    ok, encoded = cv2.imencode(".png", bgra, [cv2.IMWRITE_PNG_COMPRESSION, 1])
+    if ok:
+        return encoded.tobytes()
+
+    image = Image.fromarray(rgba_image, mode="RGBA")
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG", compress_level=1)
+    return buffer.getvalue()
+
+
 def rgba_to_png_bytes(rgba_image: np.ndarray) -> bytes:
     """
     Convert RGBA numpy array to PNG bytes.
@@ -44,10 +160,7 @@ def rgba_to_png_bytes(rgba_image: np.ndarray) -> bytes:
     Returns:
         PNG file bytes
     """
-    image = Image.fromarray(rgba_image, mode="RGBA")
-    buffer = io.BytesIO()
-    image.save(buffer, format="PNG")
-    return buffer.getvalue()
+    return _encode_png_fast(rgba_image)
 
 
 def encode_png_base64(rgba_image: np.ndarray) -> str:
@@ -61,7 +174,7 @@ def encode_png_base64(rgba_image: np.ndarray) -> str:
         Base64-encoded PNG string
     """
     png_bytes = rgba_to_png_bytes(rgba_image)
-    return base64.b64encode(png_bytes).decode("utf-8")
+    return base64.b64encode(png_bytes).decode("ascii")
 
 
 def apply_mask_to_image(rgb_image: np.ndarray, mask: np.ndarray) -> np.ndarray:
@@ -84,7 +197,7 @@ def apply_mask_to_image(rgb_image: np.ndarray, mask: np.ndarray) -> np.ndarray:
         mask = (mask * 255).astype(np.uint8) if mask.max() <= 1 else mask.astype(np.uint8)
 
     # Create RGBA image
-    rgba = np.zeros((rgb_image.shape[0], rgb_image.shape[1], 4), dtype=np.uint8)
+    rgba = np.empty((rgb_image.shape[0], rgb_image.shape[1], 4), dtype=np.uint8)
     rgba[:, :, :3] = rgb_image
     rgba[:, :, 3] = mask
 
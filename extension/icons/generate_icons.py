@@ -4,10 +4,30 @@ Run this script to create the extension icons with the alpha (α) symbol.
 
 Usage:
     pip install Pillow
-    python generate_icons.py
+    python generate_icons.py [--force] [--glyph A]
+
+Existing icons are kept unless --force is passed.
 """
+import argparse
+from pathlib import Path
 from PIL import Image, ImageDraw, ImageFont
 
+SIZES = [16, 48, 128]
+ICONS_DIR = Path(__file__).resolve().parent
+
+# Serif fonts to try for the glyph, in order of preference
+FONT_NAMES = [
+    "times.ttf",
+    "timesi.ttf",  # Times Italic
+    "Times New Roman.ttf",
+    "georgia.ttf",
+    "georgiai.ttf",  # Georgia Italic
+    "C:/Windows/Fonts/times.ttf",
+    "C:/Windows/Fonts/timesi.ttf",
+    "/usr/share/fonts/truetype/dejavu/DejaVuSerif.ttf",
+    "/System/Library/Fonts/Times.ttc",
+]
+
 
 def create_rounded_rectangle(size: int, radius: int, color: tuple) -> Image.Image:
     """Create an image with a rounded rectangle."""
@@ -17,8 +37,19 @@ def create_rounded_rectangle(size: int, radius: int, color: tuple) -> Image.Imag
     return img
 
 
-def create_icon(size: int) -> Image.Image:
-    """Create an icon with the alpha (α) symbol on a blue background."""
+def find_font() -> str | None:
+    """Return the first available serif font, or None to use Pillow's default."""
+    for font_name in FONT_NAMES:
+        try:
+            ImageFont.truetype(font_name, 12)
+            return font_name
+        except (OSError, IOError):
+            continue
+    return None
+
+
+def create_icon(size: int, glyph: str = "α", font_name: str | None = None) -> Image.Image:
+    """Create an icon with a glyph (alpha by default) on a blue background."""
     # Apple blue color
     blue = (0, 113, 227, 255)
 
@@ -27,57 +58,46 @@ def create_icon(size: int) -> Image.Image:
     img = create_rounded_rectangle(size, radius, blue)
     draw = ImageDraw.Draw(img)
 
-    # Try to use a serif font for the alpha symbol
+    # Use a serif font for the glyph if one was found
     font_size = int(size * 0.7)
-    font = None
-
-    # Try different fonts
-    font_names = [
-        "times.ttf",
-        "timesi.ttf",  # Times Italic
-        "Times New Roman.ttf",
-        "georgia.ttf",
-        "georgiai.ttf",  # Georgia Italic
-        "C:/Windows/Fonts/times.ttf",
-        "C:/Windows/Fonts/timesi.ttf",
-        "/usr/share/fonts/truetype/dejavu/DejaVuSerif.ttf",
-        "/System/Library/Fonts/Times.ttc",
-    ]
-
-    for font_name in font_names:
-        try:
-            font = ImageFont.truetype(font_name, font_size)
-            break
-        except (OSError, IOError):
-            continue
-
-    if font is None:
+    if font_name is not None:
+        font = ImageFont.truetype(font_name, font_size)
+    else:
         font = ImageFont.load_default()
 
-    # Draw the alpha symbol centered
-    text = "α"
-    bbox = draw.textbbox((0, 0), text, font=font)
+    # Draw the glyph centered
+    bbox = draw.textbbox((0, 0), glyph, font=font)
     text_width = bbox[2] - bbox[0]
     text_height = bbox[3] - bbox[1]
 
     x = (size - text_width) // 2
     y = (size - text_height) // 2 - bbox[1] + (size * 0.05)  # Slight vertical adjustment
 
-    draw.text((x, y), text, fill="white", font=font)
+    draw.text((x, y), glyph, fill="white", font=font)
 
     return img
 
 
 def main():
-    sizes = [16, 48, 128]
+    parser = argparse.ArgumentParser(description="Generate the extension icons.")
+    parser.add_argument("--force", action="store_true", help="Regenerate icons that already exist")
+    parser.add_argument("--glyph", default="α", help="Symbol to draw on the icons")
+    args = parser.parse_args()
+
+    paths = [ICONS_DIR / f"icon{size}.png" for size in SIZES]
+    if not args.force and all(path.exists() for path in paths):
+        print("Icons already exist, skipping (use --force to regenerate).")
+        return
+
+    # Look the font up once for all sizes
+    font_name = find_font()
 
-    for size in sizes:
-        icon = create_icon(size)
-        filename = f"icon{size}.png"
-        icon.save(filename)
-        print(f"Created {filename}")
+    for size, path in zip(SIZES, paths):
+        icon = create_icon(size, args.glyph, font_name)
+        icon.save(path)
+        print(f"Created {path.name}")
 
-    print("Done! Alpha icons created successfully.")
+    print("Done! Icons created successfully.")
 
 
 if __name__ == "__main__":